@@ -1,100 +1,343 @@
-import re
+try:
+    # google-re2 matches in linear time and has no catastrophic backtracking
+    import re2 as re
+    # RE2's \s is ASCII-only; widen it so full-width spaces (　) still match
+    WHITESPACE_CLASS = r'\s\p{Z}'
+    # re2 releases the GIL while matching, so threads can actually overlap
+    REGEX_RELEASES_GIL = True
+except ImportError:
+    import re
+    WHITESPACE_CLASS = r'\s'
+    REGEX_RELEASES_GIL = False
+try:
+    # Aho-Corasick finds every literal label in one pass over the text
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from docx import Document
 from docx.table import Table, _Cell
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional, Iterator
 import json
 from datetime import datetime
 
+# Any of these means a pattern is a real regex rather than a plain literal
+REGEX_META = re.compile(r'[\\.^$*+?{}\[\]|()]')
+REGEX_ESCAPE = re.compile(r'\\.')
+
+
+def widen_whitespace(pattern: str) -> str:
+    """Rewrite each \\s in a pattern to WHITESPACE_CLASS, inside or outside [...]"""
+    if WHITESPACE_CLASS == r'\s':
+        return pattern
+    
+    out = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            escape = pattern[i:i + 2]
+            if escape == r'\s':
+                out.append(WHITESPACE_CLASS if in_class else f'[{WHITESPACE_CLASS}]')
+            else:
+                # Copied whole, so an escaped backslash never starts a new escape
+                out.append(escape)
+            i += len(escape)
+            continue
+        
+        if in_class and pattern.startswith('[:', i):
+            # POSIX class such as [:space:]; its ']' does not close the set
+            end = pattern.find(':]', i + 2)
+            if end != -1:
+                out.append(pattern[i:end + 2])
+                i = end + 2
+                continue
+        
+        if not in_class and pattern[i] == '[':
+            in_class = True
+            # A ']' right after '[' or '[^' is a literal, not the end of the set
+            start = i + 2 if pattern.startswith('[^', i) else i + 1
+            if pattern.startswith(']', start):
+                start += 1
+            out.append(pattern[i:start])
+            i = start
+            continue
+        
+        if in_class and pattern[i] == ']':
+            in_class = False
+        out.append(pattern[i])
+        i += 1
+    return ''.join(out)
+
+
+def has_cased_letters(pattern: str) -> bool:
+    """Whether a pattern needs case-insensitive matching (escapes like \\s ignored)"""
+    unescaped = REGEX_ESCAPE.sub('', pattern)
+    return unescaped.lower() != unescaped.upper()
+
+
+class LabelMatcher:
+    """
+    Finds field labels in text. search() returns the first-listed field type
+    (by field order, then pattern order) matching anywhere in the text;
+    finditer() walks the text leftmost-first, like one big regex alternation.
+    
+    Plain literal patterns go through an Aho-Corasick automaton when
+    pyahocorasick is installed; everything else through at most two regexes,
+    with case folding only on the one whose patterns contain letters.
+    """
+    
+    def __init__(self, field_patterns: Dict[str, List[str]]):
+        literal_words = {}
+        # Case-insensitive (ASCII-bearing) and case-sensitive (e.g. pure Chinese) parts
+        regex_parts_ci = []
+        regex_parts_cs = []
+        # Group name -> (field order, pattern index, field type)
+        self._group_info = {}
+        # (field order, pattern index, field type, compiled regex) in listing order
+        self._ordered_regexes = []
+        
+        for order, (field_type, patterns) in enumerate(field_patterns.items()):
+            for pattern_idx, pattern in enumerate(patterns):
+                cased = has_cased_letters(pattern)
+                # Literals with cased letters stay in the regex for (?i)
+                if ahocorasick is not None and not REGEX_META.search(pattern) and not cased:
+                    # Earlier fields win when the same literal appears twice
+                    literal_words.setdefault(pattern, (order, pattern_idx, field_type, len(pattern)))
+                else:
+                    group_name = f'p{order}_{pattern_idx}'
+                    self._group_info[group_name] = (order, pattern_idx, field_type)
+                    regex_parts = regex_parts_ci if cased else regex_parts_cs
+                    widened = widen_whitespace(pattern)
+                    regex_parts.append(f'(?P<{group_name}>{widened})')
+                    flags = '(?i)' if cased else ''
+                    self._ordered_regexes.append(
+                        (order, pattern_idx, field_type, re.compile(flags + widened)))
+        
+        self._automaton = None
+        if literal_words:
+            self._automaton = ahocorasick.Automaton()
+            for word, info in literal_words.items():
+                self._automaton.add_word(word, info)
+            self._automaton.make_automaton()
+        
+        self._regexes = []
+        # Inline (?i) since re2 has no IGNORECASE flag constant
+        for flags, regex_parts in (('(?i)', regex_parts_ci), ('', regex_parts_cs)):
+            if regex_parts:
+                regex_pattern = flags + '|'.join(regex_parts)
+                self._regexes.append(re.compile(regex_pattern))
+    
+    def _next_match(self, text: str, pos: int) -> Optional[Tuple[int, str]]:
+        """Return (end, field_type) of the first label match at or after pos"""
+        best_key, best = None, None
+        
+        if self._automaton is not None:
+            for end_idx, (order, pattern_idx, field_type, length) in self._automaton.iter(text, pos):
+                key = (end_idx - length + 1, order, pattern_idx)
+                if best_key is None or key < best_key:
+                    best_key, best = key, (end_idx + 1, field_type)
+        
+        for regex in self._regexes:
+            match = regex.search(text, pos)
+            if match:
+                order, pattern_idx, field_type = self._group_info[match.lastgroup]
+                key = (match.start(), order, pattern_idx)
+                if best_key is None or key < best_key:
+                    best_key, best = key, (match.end(), field_type)
+        
+        return best
+    
+    def search(self, text: str) -> Optional[str]:
+        """Return the field type of the first-listed pattern found in text, or None"""
+        best_key, best = None, None
+        
+        if self._automaton is not None:
+            for _, (order, pattern_idx, field_type, _) in self._automaton.iter(text):
+                if best_key is None or (order, pattern_idx) < best_key:
+                    best_key, best = (order, pattern_idx), field_type
+        
+        # Only patterns listed before the best literal hit can still win
+        for order, pattern_idx, field_type, regex in self._ordered_regexes:
+            if best_key is not None and (order, pattern_idx) > best_key:
+                break
+            if regex.search(text):
+                return field_type
+        
+        return best
+    
+    def finditer(self, text: str) -> Iterator[str]:
+        """Yield the field type of every non-overlapping label in text"""
+        pos = 0
+        match = self._next_match(text, pos)
+        while match:
+            pos, field_type = match
+            yield field_type
+            match = self._next_match(text, pos)
+
+
+@dataclass(slots=True)
+class FieldInfo:
+    """Where a detected field's label is and where its value should go"""
+    label_cell: Tuple[int, int]
+    label_text: str
+    type: str  # 'vertical', 'horizontal' or 'mixed'
+    base_field_type: str
+    value_cell: Optional[Tuple[int, int]] = None
+    value_cells: Optional[List[Tuple[int, int]]] = None
+
+
 class SmartFormDetector:
     """
     A smart form detector that can analyze any Word document with tables
     and fill them intelligently based on detected patterns
     """
     
-    def __init__(self, template_path: str):
-        """Initialize with a Word document path"""
+    # Default label patterns, shared by every instance
+    FIELD_PATTERNS = {
+        # Personal Information Patterns (Chinese)
+        'name': [r'姓\s*名', r'申请人', r'负责人', r'姓名：', r'名字'],
+        'gender': [r'性\s*别', r'性别：'],
+        'birth_date': [r'出生年月', r'出生日期', r'生日', r'出生时间'],
+        'phone': [r'电\s*话', r'联系电话', r'手机', r'联系方式', r'电话号码'],
+        'email': [r'邮\s*箱', r'电子邮件', r'E-?mail', r'电邮'],
+        'ethnicity': [r'民\s*族', r'民族：'],
+        'nationality': [r'国\s*籍', r'国籍：'],
+        'id_number': [r'身份证', r'证件号', r'身份证号'],
+        'address': [r'地\s*址', r'住址', r'通讯地址', r'联系地址'],
+        
+        # Professional Information
+        'title': [r'职\s*称', r'职务', r'专业技术职务', r'技术职称', r'职位'],
+        'department': [r'部\s*门', r'院系', r'单位', r'所在部门', r'工作单位'],
+        'degree': [r'学\s*位', r'学历', r'最高学位', r'最终学位'],
+        'major': [r'专\s*业', r'研究方向', r'研究领域', r'专业方向'],
+        
+        # Project/Research Related
+        'project_name': [r'项目名称', r'课题名称', r'研究名称', r'项目题目'],
+        'project_number': [r'项目编号', r'项目号', r'课题编号', r'编号'],
+        'funding': [r'经\s*费', r'资助金额', r'项目经费', r'资金', r'金额'],
+        'period': [r'期\s*限', r'周期', r'起止时间', r'时间段', r'年限'],
+        'date': [r'日\s*期', r'时间', r'年月日', r'申请日期'],
+        
+        # Publication Related
+        'paper_title': [r'论文题目', r'论文名称', r'文章标题', r'论文标题', r'题目'],
+        'journal': [r'期\s*刊', r'杂志', r'发表期刊', r'刊物', r'会议'],
+        'author': [r'作\s*者', r'著者', r'作者姓名', r'第一作者'],
+        
+        # Award Related
+        'award_name': [r'奖项名称', r'获奖名称', r'奖励名称', r'成果名称'],
+        'award_level': [r'奖励等级', r'获奖等级', r'奖项级别', r'等级'],
+        'award_date': [r'获奖时间', r'获奖日期', r'颁奖时间'],
+        
+        # Other Common Fields
+        'description': [r'描\s*述', r'简介', r'说明', r'内容', r'详情', r'成果简介'],
+        'notes': [r'备\s*注', r'说明', r'其他', r'附注', r'注释'],
+        'signature': [r'签\s*名', r'签字', r'申请人签名', r'负责人签名'],
+        'year': [r'年\s*度', r'年份', r'学年', r'年'],
+    }
+    
+    # Built once when the class is defined
+    LABEL_MATCHER = LabelMatcher(FIELD_PATTERNS)
+    
+    # Below this many tables a thread pool costs more than it saves
+    PARALLEL_MIN_TABLES = 32
+    
+    def __init__(self, template_path: str, extra_patterns: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize with a Word document path
+        
+        Args:
+            template_path: Path to the Word document
+            extra_patterns: Optional {field_type: [regex, ...]} appended to the
+                            FIELD_PATTERNS list of each field type (new field
+                            types go last), for this instance only
+        """
         self.doc = Document(template_path)
         self.tables_info = []
-        self.field_patterns = {
-            # Personal Information Patterns (Chinese)
-            'name': [r'姓\s*名', r'申请人', r'负责人', r'姓名：', r'名字'],
-            'gender': [r'性\s*别', r'性别：'],
-            'birth_date': [r'出生年月', r'出生日期', r'生日', r'出生时间'],
-            'phone': [r'电\s*话', r'联系电话', r'手机', r'联系方式', r'电话号码'],
-            'email': [r'邮\s*箱', r'电子邮件', r'E-?mail', r'电邮'],
-            'ethnicity': [r'民\s*族', r'民族：'],
-            'nationality': [r'国\s*籍', r'国籍：'],
-            'id_number': [r'身份证', r'证件号', r'身份证号'],
-            'address': [r'地\s*址', r'住址', r'通讯地址', r'联系地址'],
-            
-            # Professional Information
-            'title': [r'职\s*称', r'职务', r'专业技术职务', r'技术职称', r'职位'],
-            'department': [r'部\s*门', r'院系', r'单位', r'所在部门', r'工作单位'],
-            'degree': [r'学\s*位', r'学历', r'最高学位', r'最终学位'],
-            'major': [r'专\s*业', r'研究方向', r'研究领域', r'专业方向'],
-            
-            # Project/Research Related
-            'project_name': [r'项目名称', r'课题名称', r'研究名称', r'项目题目'],
-            'project_number': [r'项目编号', r'项目号', r'课题编号', r'编号'],
-            'funding': [r'经\s*费', r'资助金额', r'项目经费', r'资金', r'金额'],
-            'period': [r'期\s*限', r'周期', r'起止时间', r'时间段', r'年限'],
-            'date': [r'日\s*期', r'时间', r'年月日', r'申请日期'],
-            
-            # Publication Related
-            'paper_title': [r'论文题目', r'论文名称', r'文章标题', r'论文标题', r'题目'],
-            'journal': [r'期\s*刊', r'杂志', r'发表期刊', r'刊物', r'会议'],
-            'author': [r'作\s*者', r'著者', r'作者姓名', r'第一作者'],
-            
-            # Award Related
-            'award_name': [r'奖项名称', r'获奖名称', r'奖励名称', r'成果名称'],
-            'award_level': [r'奖励等级', r'获奖等级', r'奖项级别', r'等级'],
-            'award_date': [r'获奖时间', r'获奖日期', r'颁奖时间'],
-            
-            # Other Common Fields
-            'description': [r'描\s*述', r'简介', r'说明', r'内容', r'详情', r'成果简介'],
-            'notes': [r'备\s*注', r'说明', r'其他', r'附注', r'注释'],
-            'signature': [r'签\s*名', r'签字', r'申请人签名', r'负责人签名'],
-            'year': [r'年\s*度', r'年份', r'学年', r'年'],
-        }
+        # Copy the lists too, so editing them never changes the class defaults
+        self.field_patterns = {field_type: list(patterns) for field_type, patterns in self.FIELD_PATTERNS.items()}
+        self.label_matcher = self.LABEL_MATCHER
+        if extra_patterns:
+            for field_type, patterns in extra_patterns.items():
+                self.field_patterns.setdefault(field_type, []).extend(patterns)
+            self.label_matcher = LabelMatcher(self.field_patterns)
+        
+        # Punctuation that usually marks a label (e.g. "姓名：")
+        self._label_indicator_set = frozenset('：:(（/、')
+        
+        # doc.tables walks the whole body on each access, so list the tables once
+        self._tables = list(self.doc.tables)
         
         # Analyze all tables in the document
         self.analyze_document()
     
     def analyze_document(self):
         """Analyze all tables in the document"""
-        print(f"Found {len(self.doc.tables)} tables in the document")
-        
-        for idx, table in enumerate(self.doc.tables):
-            table_info = {
-                'index': idx,
-                'rows': len(table.rows),
-                'cols': len(table.columns),
-                'headers': [],
-                'field_mapping': {},
-                'structure': self.analyze_table_structure(table)
-            }
-            
-            # Try to identify headers and fields
-            self.identify_table_fields(table, table_info)
-            self.tables_info.append(table_info)
-            
+        print(f"Found {len(self._tables)} tables in the document")
+        
+        # Read every table into plain lists first; python-docx objects are only
+        # touched here, on the calling thread
+        snapshots = [
+            (idx, self._snapshot_table(table), len(table.columns))
+            for idx, table in enumerate(self._tables)
+        ]
+        
+        # The per-table analysis only works on those lists, so it can run in
+        # parallel; that only pays off with re2 and many tables
+        if REGEX_RELEASES_GIL and len(snapshots) >= self.PARALLEL_MIN_TABLES:
+            with ThreadPoolExecutor() as executor:
+                self.tables_info = list(executor.map(self._analyze_snapshot, snapshots))
+        else:
+            self.tables_info = list(map(self._analyze_snapshot, snapshots))
+        
+        for idx, table_info in enumerate(self.tables_info):
             print(f"\nTable {idx + 1}:")
             print(f"  Dimensions: {table_info['rows']} rows × {table_info['cols']} columns")
             print(f"  Detected fields: {list(table_info['field_mapping'].keys())}")
     
-    def analyze_table_structure(self, table: Table) -> str:
+    def _analyze_snapshot(self, snapshot: Tuple[int, List[List[str]], int]) -> Dict:
+        """Build the table_info for one (index, cell_texts, cols) snapshot"""
+        idx, cell_texts, cols = snapshot
+        table_info = {
+            'index': idx,
+            'rows': len(cell_texts),
+            'cols': cols,
+            'headers': [],
+            'field_mapping': {},
+            'cell_texts': cell_texts,
+            'col_counts': [len(row) for row in cell_texts]
+        }
+        table_info['structure'] = self.analyze_table_structure(table_info)
+        
+        # Try to identify headers and fields
+        self.identify_table_fields(table_info)
+        return table_info
+    
+    def _snapshot_table(self, table: Table) -> List[List[str]]:
+        """Read the stripped text of every cell once, as a row-major 2D list"""
+        # Row.cells (not raw <w:tc> elements) keeps columns aligned with the
+        # layout grid when cells are merged
+        return [[cell.text.strip() for cell in row.cells] for row in table.rows]
+    
+    def analyze_table_structure(self, table_info: Dict) -> str:
         """Determine the structure type of the table"""
-        if len(table.rows) == 0:
+        cell_texts = table_info['cell_texts']
+        row_count = table_info['rows']
+        if row_count == 0:
             return "empty"
         
         # Check if it's a vertical form (label-value pairs in rows)
-        first_col_texts = [row.cells[0].text.strip() for row in table.rows if len(row.cells) > 0]
+        first_col_texts = [
+            row[0] for row, col_count in zip(cell_texts, table_info['col_counts']) if col_count > 0
+        ]
         if self.contains_multiple_labels(first_col_texts):
             return "vertical"
         
         # Check if it's a horizontal form (headers in first row)
-        if len(table.rows) > 0:
-            first_row_texts = [cell.text.strip() for cell in table.rows[0].cells]
+        if row_count > 0:
+            first_row_texts = cell_texts[0]
             if self.contains_multiple_labels(first_row_texts):
                 return "horizontal"
         
@@ -104,109 +347,150 @@ class SmartFormDetector:
     def contains_multiple_labels(self, texts: List[str]) -> bool:
         """Check if texts contain multiple field labels"""
         label_count = 0
-        for text in texts:
-            for field_type, patterns in self.field_patterns.items():
-                for pattern in patterns:
-                    if re.search(pattern, text, re.IGNORECASE):
-                        label_count += 1
-                        break
-        return label_count >= 2
+        # Scan each distinct non-empty text once; repeats (merged cells
+        # report the same text per grid column) still count per occurrence
+        text_counts = Counter(texts)
+        text_counts.pop('', None)
+        for text, occurrences in text_counts.items():
+            for _ in self.label_matcher.finditer(text):
+                label_count += occurrences
+                # Two labels are enough, no need to scan the rest
+                if label_count >= 2:
+                    return True
+        return False
+    
+    def match_field_type(self, text: str) -> Optional[str]:
+        """Return the field type whose label pattern matches text, or None"""
+        return self.label_matcher.search(text)
     
-    def identify_table_fields(self, table: Table, table_info: Dict):
+    def identify_table_fields(self, table_info: Dict):
         """Identify fields in a table based on patterns"""
         structure = table_info['structure']
         
-        if structure == "vertical":
-            self.identify_vertical_fields(table, table_info)
+        if structure == "vertical" and table_info['cols'] == 2:
+            # Most vertical forms are a plain label column + value column
+            self._identify_vertical_2col(table_info)
+        elif structure == "vertical":
+            self.identify_vertical_fields(table_info)
         elif structure == "horizontal":
-            self.identify_horizontal_fields(table, table_info)
+            self.identify_horizontal_fields(table_info)
         else:
-            self.identify_mixed_fields(table, table_info)
+            self.identify_mixed_fields(table_info)
     
-    def identify_vertical_fields(self, table: Table, table_info: Dict):
+    def identify_vertical_fields(self, table_info: Dict):
         """Identify fields in vertical tables (label in one column, value in next)"""
-        for row_idx, row in enumerate(table.rows):
-            for col_idx in range(len(row.cells) - 1):
-                label_text = row.cells[col_idx].text.strip()
+        col_counts = table_info['col_counts']
+        for row_idx, row in enumerate(table_info['cell_texts']):
+            for col_idx in range(col_counts[row_idx] - 1):
+                label_text = row[col_idx]
                 
                 # Check if this cell contains a field label
-                for field_type, patterns in self.field_patterns.items():
-                    for pattern in patterns:
-                        if re.search(pattern, label_text, re.IGNORECASE):
-                            # The next cell is likely the value field
-                            table_info['field_mapping'][field_type] = {
-                                'label_cell': (row_idx, col_idx),
-                                'value_cell': (row_idx, col_idx + 1),
-                                'label_text': label_text,
-                                'type': 'vertical'
-                            }
-                            break
+                field_type = self.match_field_type(label_text)
+                if field_type:
+                    # The next cell is likely the value field
+                    table_info['field_mapping'][field_type] = FieldInfo(
+                        label_cell=(row_idx, col_idx),
+                        value_cell=(row_idx, col_idx + 1),
+                        label_text=label_text,
+                        type='vertical',
+                        base_field_type=field_type
+                    )
+    
+    def _identify_vertical_2col(self, table_info: Dict):
+        """identify_vertical_fields for two-column tables: labels in col 0, values in col 1"""
+        col_counts = table_info['col_counts']
+        for row_idx, row in enumerate(table_info['cell_texts']):
+            if col_counts[row_idx] < 2:
+                continue
+            field_type = self.match_field_type(row[0])
+            if field_type:
+                table_info['field_mapping'][field_type] = FieldInfo(
+                    label_cell=(row_idx, 0),
+                    value_cell=(row_idx, 1),
+                    label_text=row[0],
+                    type='vertical',
+                    base_field_type=field_type
+                )
     
-    def identify_horizontal_fields(self, table: Table, table_info: Dict):
+    def identify_horizontal_fields(self, table_info: Dict):
         """Identify fields in horizontal tables (headers in first row)"""
-        if len(table.rows) < 2:
+        cell_texts = table_info['cell_texts']
+        row_count = table_info['rows']
+        if row_count < 2:
             return
         
         # Analyze headers
         headers = []
-        for col_idx, cell in enumerate(table.rows[0].cells):
-            header_text = cell.text.strip()
+        for col_idx, header_text in enumerate(cell_texts[0]):
             headers.append(header_text)
             
             # Check if this header matches any field pattern
-            for field_type, patterns in self.field_patterns.items():
-                for pattern in patterns:
-                    if re.search(pattern, header_text, re.IGNORECASE):
-                        table_info['field_mapping'][f"{field_type}_{col_idx}"] = {
-                            'label_cell': (0, col_idx),
-                            'value_cells': [(row_idx, col_idx) for row_idx in range(1, len(table.rows))],
-                            'label_text': header_text,
-                            'type': 'horizontal'
-                        }
-                        break
+            field_type = self.match_field_type(header_text)
+            if field_type:
+                table_info['field_mapping'][f"{field_type}_{col_idx}"] = FieldInfo(
+                    label_cell=(0, col_idx),
+                    value_cells=[(row_idx, col_idx) for row_idx in range(1, row_count)],
+                    label_text=header_text,
+                    type='horizontal',
+                    base_field_type=field_type
+                )
         
         table_info['headers'] = headers
     
-    def identify_mixed_fields(self, table: Table, table_info: Dict):
+    def identify_mixed_fields(self, table_info: Dict):
         """Identify fields in mixed/complex tables"""
-        # Search all cells for patterns
-        for row_idx, row in enumerate(table.rows):
-            for col_idx, cell in enumerate(row.cells):
-                cell_text = cell.text.strip()
-                
-                # Skip empty cells
-                if not cell_text:
-                    continue
-                
-                # Check if this cell contains a field label
-                for field_type, patterns in self.field_patterns.items():
-                    for pattern in patterns:
-                        if re.search(pattern, cell_text, re.IGNORECASE):
-                            # Determine where the value might be
-                            value_location = self.find_value_location(table, row_idx, col_idx)
-                            if value_location:
-                                key = f"{field_type}_{row_idx}_{col_idx}"
-                                table_info['field_mapping'][key] = {
-                                    'label_cell': (row_idx, col_idx),
-                                    'value_cell': value_location,
-                                    'label_text': cell_text,
-                                    'type': 'mixed'
-                                }
-                            break
+        cell_texts = table_info['cell_texts']
+        
+        # Flatten to the non-empty cells so the scan is one regex search per cell
+        nonempty_cells = [
+            (row_idx, col_idx, cell_text)
+            for row_idx, row in enumerate(cell_texts)
+            for col_idx, cell_text in enumerate(row)
+            if cell_text
+        ]
+        
+        # Classify every cell once, remembering which ones look like labels so
+        # find_value_location can skip them without re-running the patterns
+        matched_cells = []
+        label_mask = set()
+        for row_idx, col_idx, cell_text in nonempty_cells:
+            field_type = self.match_field_type(cell_text)
+            if field_type:
+                matched_cells.append((row_idx, col_idx, cell_text, field_type))
+                label_mask.add((row_idx, col_idx))
+            elif self._label_indicator_set.intersection(cell_text):
+                label_mask.add((row_idx, col_idx))
+        table_info['label_mask'] = label_mask
+        
+        for row_idx, col_idx, cell_text, field_type in matched_cells:
+            # Determine where the value might be
+            value_location = self.find_value_location(table_info, row_idx, col_idx)
+            if value_location:
+                key = f"{field_type}_{row_idx}_{col_idx}"
+                table_info['field_mapping'][key] = FieldInfo(
+                    label_cell=(row_idx, col_idx),
+                    value_cell=value_location,
+                    label_text=cell_text,
+                    type='mixed',
+                    base_field_type=field_type
+                )
     
-    def find_value_location(self, table: Table, label_row: int, label_col: int) -> Tuple[int, int]:
-        """Find the most likely location for a value given a label location"""
+    def find_value_location(self, table_info: Dict, label_row: int, label_col: int) -> Tuple[int, int]:
+        """
+        Find the most likely location for a value given a label location,
+        using the label_mask built by identify_mixed_fields
+        """
+        col_counts = table_info['col_counts']
+        label_mask = table_info['label_mask']
+        
         # Check right cell first
-        if label_col + 1 < len(table.rows[label_row].cells):
-            right_cell = table.rows[label_row].cells[label_col + 1].text.strip()
-            if not self.is_likely_label(right_cell):
-                return (label_row, label_col + 1)
+        if label_col + 1 < col_counts[label_row] and (label_row, label_col + 1) not in label_mask:
+            return (label_row, label_col + 1)
         
         # Check cell below
-        if label_row + 1 < len(table.rows) and label_col < len(table.rows[label_row + 1].cells):
-            below_cell = table.rows[label_row + 1].cells[label_col].text.strip()
-            if not self.is_likely_label(below_cell):
-                return (label_row + 1, label_col)
+        if (label_row + 1 < table_info['rows'] and label_col < col_counts[label_row + 1]
+                and (label_row + 1, label_col) not in label_mask):
+            return (label_row + 1, label_col)
         
         # Check same cell (label and value might be in same cell with separator)
         return (label_row, label_col)
@@ -214,34 +498,37 @@ class SmartFormDetector:
     def is_likely_label(self, text: str) -> bool:
         """Check if text is likely a label rather than a value"""
         # Check if it matches any label pattern
-        for patterns in self.field_patterns.values():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    return True
+        if self.label_matcher.search(text):
+            return True
         
         # Check for common label indicators
-        label_indicators = ['：', ':', '(', '（', '/', '、']
-        return any(indicator in text for indicator in label_indicators)
+        return bool(self._label_indicator_set.intersection(text))
     
-    def get_cell_value(self, table: Table, row: int, col: int) -> str:
-        """Safely get cell value"""
-        try:
-            return table.rows[row].cells[col].text.strip()
-        except:
-            return ""
+    def get_cell_value(self, table_info: Dict, row: int, col: int) -> str:
+        """Safely get cell value (as read when the table was analyzed)"""
+        if 0 <= row < table_info['rows'] and 0 <= col < table_info['col_counts'][row]:
+            return table_info['cell_texts'][row][col]
+        return ""
     
     def set_cell_value(self, table: Table, row: int, col: int, value: str):
         """Safely set cell value"""
-        try:
-            cell = table.rows[row].cells[col]
-            # Clear existing content
-            for paragraph in cell.paragraphs:
-                paragraph.clear()
-            # Add new content
-            paragraph = cell.paragraphs[0] if cell.paragraphs else cell.add_paragraph()
-            paragraph.text = value
-        except Exception as e:
-            print(f"Error setting cell ({row}, {col}): {e}")
+        rows = table.rows
+        cells = rows[row].cells if 0 <= row < len(rows) else ()
+        if not 0 <= col < len(cells):
+            print(f"Error setting cell ({row}, {col}): cell out of range")
+            return
+        
+        tc = cells[col]._tc
+        # Work on the <w:tc> element directly: keep only the first paragraph
+        # (and its formatting), then give it a single run holding the value
+        paragraphs = tc.p_lst
+        p = paragraphs[0] if paragraphs else tc.add_p()
+        for extra in paragraphs[1:]:
+            tc.remove(extra)
+        p.clear_content()
+        r = p.add_r()
+        if value:
+            r.text = value
     
     def fill_form(self, data: Dict[str, Any]):
         """
@@ -254,46 +541,46 @@ class SmartFormDetector:
         filled_count = 0
         
         for table_idx, table_info in enumerate(self.tables_info):
-            table = self.doc.tables[table_idx]
+            table = self._tables[table_idx]
             
             print(f"\nFilling Table {table_idx + 1}:")
             
             for field_key, field_info in table_info['field_mapping'].items():
-                # Extract base field type (remove indices)
-                base_field_type = field_key.split('_')[0]
+                # Base field type without the row/col suffix of the key
+                base_field_type = field_info.base_field_type
                 
                 if base_field_type in data:
                     value = str(data[base_field_type])
                     
-                    if field_info['type'] == 'vertical':
+                    if field_info.type == 'vertical':
                         # Fill single cell
-                        row, col = field_info['value_cell']
+                        row, col = field_info.value_cell
                         self.set_cell_value(table, row, col, value)
-                        print(f"  Filled {field_info['label_text']}: {value}")
+                        print(f"  Filled {field_info.label_text}: {value}")
                         filled_count += 1
                     
-                    elif field_info['type'] == 'horizontal':
+                    elif field_info.type == 'horizontal':
                         # For horizontal tables, we might need to handle multiple rows
-                        if 'value_cells' in field_info and field_info['value_cells']:
+                        if field_info.value_cells:
                             # Fill first available row
-                            row, col = field_info['value_cells'][0]
+                            row, col = field_info.value_cells[0]
                             self.set_cell_value(table, row, col, value)
-                            print(f"  Filled {field_info['label_text']}: {value}")
+                            print(f"  Filled {field_info.label_text}: {value}")
                             filled_count += 1
                     
-                    elif field_info['type'] == 'mixed':
-                        row, col = field_info['value_cell']
+                    elif field_info.type == 'mixed':
+                        row, col = field_info.value_cell
                         
                         # Check if value is in the same cell as label
-                        if (row, col) == field_info['label_cell']:
+                        if (row, col) == field_info.label_cell:
                             # Replace or append value after label
-                            current_text = self.get_cell_value(table, row, col)
-                            new_text = f"{field_info['label_text']}：{value}"
+                            current_text = self.get_cell_value(table_info, row, col)
+                            new_text = f"{field_info.label_text}：{value}"
                             self.set_cell_value(table, row, col, new_text)
                         else:
                             self.set_cell_value(table, row, col, value)
                         
-                        print(f"  Filled {field_info['label_text']}: {value}")
+                        print(f"  Filled {field_info.label_text}: {value}")
                         filled_count += 1
         
         print(f"\nTotal fields filled: {filled_count}")
@@ -318,9 +605,9 @@ class SmartFormDetector:
             
             for field_key, field_info in table_info['field_mapping'].items():
                 table_data['fields'][field_key] = {
-                    'label': field_info['label_text'],
-                    'type': field_info['type'],
-                    'location': str(field_info.get('value_cell', field_info.get('value_cells', 'N/A')))
+                    'label': field_info.label_text,
+                    'type': field_info.type,
+                    'location': str(field_info.value_cell or field_info.value_cells or 'N/A')
                 }
             
             export_data.append(table_data)
@@ -392,39 +679,40 @@ if __name__ == "__main__":
         traceback.print_exc()
 
 
-#how to use
+#how to use (kept as comments so importing this module stays cheap)
 # Create detector for any Word document
-detector = SmartFormDetector("any_form.docx")
-
+# detector = SmartFormDetector("any_form.docx")
+#
 # Prepare your data
-data = {
-    'name': 'John Doe',
-    'phone': '123-456-7890',
-    'email': 'john@example.com',
-    'title': 'Professor',
-    # Add any fields you want to fill
-}
-
+# data = {
+#     'name': 'John Doe',
+#     'phone': '123-456-7890',
+#     'email': 'john@example.com',
+#     'title': 'Professor',
+#     # Add any fields you want to fill
+# }
+#
 # Fill the form
-detector.fill_form(data)
-
+# detector.fill_form(data)
+#
 # Save the result
-detector.save("filled_form.docx")
+# detector.save("filled_form.docx")
 
 #yunxing
 #python smart_form_detector.py your_document.docx
 
 
 # Add your own patterns for specific fields
-detector.field_patterns['custom_field'] = [r'特殊字段', r'Special Field']
-
+# detector = SmartFormDetector("any_form.docx",
+#                              extra_patterns={'custom_field': [r'特殊字段', r'Special Field']})
+#
 # For tables with multiple rows (like publications)
-data = {
-    'paper_title': 'My Research Paper',  # Will fill first available row
-}
-
+# data = {
+#     'paper_title': 'My Research Paper',  # Will fill first available row
+# }
+#
 # See what fields were detected
-detector.export_field_mapping("my_fields.json")
+# detector.export_field_mapping("my_fields.json")
 
 
 # | Name    | [John]  |
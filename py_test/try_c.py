@@ -1,10 +1,64 @@
 import pandas as pd
+from copy import deepcopy
 from docx import Document
+from docx.oxml.ns import nsmap, qn
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from lxml import etree
 import re
+import zipfile
+
+_W = {"w": nsmap["w"]}
+# Every <w:t> below an element, compiled once
+_ALL_T = etree.XPath(".//w:t", namespaces=_W)
 
 class ResearchAwardFormFiller:
+    # No per-instance __dict__; the filler only ever holds these
+    __slots__ = ("doc", "form_data", "_parts", "_package_sig")
+    
+    # Table 1 text fields; "academic_positions" (a list) is added separately
+    _BASIC_KEYS = (
+        "name",  # 姓名
+        "gender",  # 性别
+        "ethnicity",  # 民族
+        "birth_date",  # 出生年月
+        "professional_title",  # 专业技术职务
+        "administrative_position",  # 行政职务
+        "department_head",  # 系主任
+        "final_degree",  # 最终学位及授予国家或地区及学校
+        "research_direction",  # 研究方向
+        "contact_phone",  # 联系电话
+        "work_unit",  # 所在工作单位
+    )
+    
+    # (row, col, basic_info key) of each Table 1 value cell
+    # Note: These positions are estimates based on the document structure
+    # You may need to adjust them based on the actual table layout
+    _BASIC_CELLS = (
+        (1, 2, "name"),  # Name (姓名)
+        (1, 4, "gender"),  # Gender (性别)
+        (1, 6, "ethnicity"),  # Ethnicity (民族)
+        (1, 8, "birth_date"),  # Birth date (出生年月)
+        (2, 2, "professional_title"),  # Professional title (专业技术职务)
+        (2, 8, "final_degree"),  # Final degree (最终学位)
+        (3, 2, "research_direction"),  # Research direction (研究方向)
+        (3, 8, "contact_phone"),  # Contact phone (联系电话)
+        (4, 4, "work_unit"),  # Work unit (所在工作单位)
+    )
+    
+    # (table index, form_data key, item keys in column order) for the list tables
+    TABLE_SPECS = (
+        (2, "projects", ("number", "name", "funding", "period", "source")),  # Table 3
+        (3, "publications", ("title", "date", "journal", "volume", "level", "author_rank")),  # Table 4
+        (4, "think_tank", ("name", "year", "adopting_unit", "author_rank", "notes")),  # Table 5
+        (5, "patents", ("name", "patent_number", "year", "country", "author_rank", "economic_benefit")),  # Table 6
+        (6, "awards", ("project_name", "award_type", "granting_unit", "award_date")),  # Table 7
+    )
+    
+    # (parsed Document, raw zip parts, package signature) per template path,
+    # see from_cached_template
+    _TEMPLATE_CACHE = {}
+    
     def __init__(self, template_path):
         """
         Initialize the form filler with a template document
@@ -13,22 +67,60 @@ class ResearchAwardFormFiller:
             template_path: Path to the template Word document
         """
         self.doc = Document(template_path)
+        self._parts = self._read_parts(template_path)
+        self._package_sig = self._package_signature(self.doc)
+        self._init_form_data()
+    
+    @classmethod
+    def from_cached_template(cls, template_path):
+        """
+        Create a form filler from a template parsed only once per path
+        
+        Args:
+            template_path: Path to the template Word document
+        """
+        cached = cls._TEMPLATE_CACHE.get(template_path)
+        if cached is None:
+            template = Document(template_path)
+            cached = cls._TEMPLATE_CACHE[template_path] = (
+                template, cls._read_parts(template_path), cls._package_signature(template))
+        template, parts, package_sig = cached
+        
+        # Deepcopy of the parsed package is cheaper than re-reading the zip
+        # and re-parsing every XML part; the raw parts are never mutated
+        inst = cls.__new__(cls)
+        inst.doc = deepcopy(template)
+        inst._parts = parts
+        inst._package_sig = package_sig
+        inst._init_form_data()
+        return inst
+    
+    @staticmethod
+    def _read_parts(template_path):
+        """(name, bytes) of every entry in the template's zip, in archive order"""
+        with zipfile.ZipFile(template_path) as zf:
+            return tuple((info.filename, zf.read(info)) for info in zf.infolist())
+    
+    @staticmethod
+    def _package_signature(doc):
+        """Every relationship in the package, and the content of every part but the main document"""
+        def rels_key(rels):
+            return tuple((rel.rId, rel.reltype, rel.target_ref, rel.is_external) for rel in rels.values())
+        
+        package = doc.part.package
+        return (rels_key(package.rels),) + tuple(
+            (str(part.partname), None if part is doc.part else part.blob, rels_key(part.rels))
+            for part in package.iter_parts()
+        )
+    
+    def _init_form_data(self):
+        """Reset form_data to an empty form"""
+        basic_info = dict.fromkeys(self._BASIC_KEYS, "")
+        basic_info["academic_positions"] = []  # 主要学术任职 (list of strings)
+        
         self.form_data = {
             # Table 1: Basic Information (基本信息)
-            "basic_info": {
-                "name": "",  # 姓名
-                "gender": "",  # 性别
-                "ethnicity": "",  # 民族
-                "birth_date": "",  # 出生年月
-                "professional_title": "",  # 专业技术职务
-                "administrative_position": "",  # 行政职务
-                "department_head": "",  # 系主任
-                "final_degree": "",  # 最终学位及授予国家或地区及学校
-                "research_direction": "",  # 研究方向
-                "contact_phone": "",  # 联系电话
-                "work_unit": "",  # 所在工作单位
-                "academic_positions": [],  # 主要学术任职 (list of strings)
-            },
+            "basic_info": basic_info,
             
             # Table 2: Main Innovations (主要创新成果)
             "innovations": "",  # Long text describing innovations
@@ -122,17 +214,102 @@ class ResearchAwardFormFiller:
     
     def fill_table_cell(self, table, row_idx, col_idx, text):
         """Helper function to fill a specific cell in a table"""
-        try:
-            cell = table.rows[row_idx].cells[col_idx]
-            # Clear existing content
-            for paragraph in cell.paragraphs:
-                paragraph.clear()
-            # Add new content
-            paragraph = cell.paragraphs[0] if cell.paragraphs else cell.add_paragraph()
-            paragraph.text = str(text)
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        except Exception as e:
-            print(f"Error filling cell at row {row_idx}, col {col_idx}: {e}")
+        tc = self._cell_tc(table, row_idx, col_idx)
+        if tc is None:
+            print(f"Error filling cell at row {row_idx}, col {col_idx}: out of range")
+            return
+        self._set_cell_text(tc, text)
+    
+    def fill_table_cell_lines(self, table, row_idx, col_idx, lines):
+        """Fill a specific cell in a table with one paragraph per line"""
+        tc = self._cell_tc(table, row_idx, col_idx)
+        if tc is None:
+            print(f"Error filling cell at row {row_idx}, col {col_idx}: out of range")
+            return
+        self._set_cell_lines(tc, lines)
+    
+    def fill_row_cells(self, tr, values):
+        """
+        Fill one table row with values, starting from the first column.
+        Empty values are skipped; those cells keep their formatting, but not
+        their text, since fill_form blanks the row's text beforehand.
+        
+        Args:
+            tr: The row's <w:tr> element (from table._tbl.tr_lst)
+            values: Cell values in column order
+        """
+        tcs = self._grid_tcs(tr)
+        if len(values) > len(tcs):
+            print(f"Error filling row: {len(values)} values for {len(tcs)} columns")
+        for text, tc in zip(values, tcs):
+            if self._is_empty(text):
+                continue
+            self._set_cell_text(tc, text)
+    
+    @staticmethod
+    def _is_empty(value):
+        """Whether a field value means "leave the cell alone"; 0 and other falsy values are still written"""
+        return value is None or value == ""
+    
+    def _cell_tc(self, table, row_idx, col_idx):
+        """<w:tc> at grid position (row_idx, col_idx), or None when out of range"""
+        trs = table._tbl.tr_lst
+        if not 0 <= row_idx < len(trs):
+            return None
+        tcs = self._grid_tcs(trs[row_idx])
+        if not 0 <= col_idx < len(tcs):
+            return None
+        return tcs[col_idx]
+    
+    def _grid_tcs(self, tr):
+        """<w:tc> elements of a <w:tr> with one entry per grid column, like Row.cells"""
+        tcs = []
+        for tc in tr.tc_lst:
+            # A vertically merged cell's content lives in the cell above
+            while tc.vMerge == "continue":
+                tc = tc._tc_above
+            tcs.extend([tc] * tc.grid_span)
+        return tcs
+    
+    def _set_cell_text(self, tc, text):
+        """Replace the text of a <w:tc> element, reusing its first run"""
+        t_elems = _ALL_T(tc)
+        if t_elems:
+            # CT_R.text keeps the run's formatting and turns \n / \t into <w:br/> / <w:tab/>
+            run = t_elems[0].getparent()
+            run.text = str(text)
+            for extra in t_elems[1:]:
+                extra.text = ""
+            paragraph = next(run.iterancestors(qn("w:p")))
+        else:
+            paragraph = tc.p_lst[0] if tc.p_lst else tc.add_p()
+            paragraph.add_r().text = str(text)
+        paragraph.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.LEFT
+    
+    def _set_cell_lines(self, tc, lines):
+        """Replace the content of a <w:tc> element with one paragraph per line"""
+        paragraphs = tc.p_lst
+        
+        # Build one empty paragraph carrying the cell's existing paragraph and
+        # run formatting, then deepcopy it for every line
+        line_p = deepcopy(paragraphs[0]) if paragraphs else tc.add_p()
+        runs = line_p.r_lst
+        rPr = runs[0].rPr if runs else None
+        line_p.clear_content()
+        # Word expects w14:paraId to be unique per paragraph
+        for attr in [name for name in line_p.attrib if name.endswith(("}paraId", "}textId"))]:
+            del line_p.attrib[attr]
+        line_p.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.LEFT
+        line_r = line_p.add_r()
+        if rPr is not None:
+            line_r.insert(0, rPr)
+        
+        for paragraph in tc.p_lst:
+            tc.remove(paragraph)
+        for line in lines:
+            paragraph = deepcopy(line_p)
+            paragraph.r_lst[0].text = str(line)
+            tc.append(paragraph)
     
     def fill_form(self):
         """Fill the form with the provided data"""
@@ -143,109 +320,61 @@ class ResearchAwardFormFiller:
             table1 = tables[0]
             info = self.form_data["basic_info"]
             
-            # Map fields to their positions in the table
-            # Note: These positions are estimates based on the document structure
-            # You may need to adjust them based on the actual table layout
-            
-            # Name (姓名)
-            self.fill_table_cell(table1, 1, 2, info["name"])
-            # Gender (性别)
-            self.fill_table_cell(table1, 1, 4, info["gender"])
-            # Ethnicity (民族)
-            self.fill_table_cell(table1, 1, 6, info["ethnicity"])
-            # Birth date (出生年月)
-            self.fill_table_cell(table1, 1, 8, info["birth_date"])
-            
-            # Professional title (专业技术职务)
-            self.fill_table_cell(table1, 2, 2, info["professional_title"])
-            # Final degree (最终学位)
-            self.fill_table_cell(table1, 2, 8, info["final_degree"])
-            
-            # Research direction (研究方向)
-            self.fill_table_cell(table1, 3, 2, info["research_direction"])
-            # Contact phone (联系电话)
-            self.fill_table_cell(table1, 3, 8, info["contact_phone"])
-            
-            # Work unit (所在工作单位)
-            self.fill_table_cell(table1, 4, 4, info["work_unit"])
+            # Fields left empty are skipped so the template cell keeps its content
+            for row_idx, col_idx, key in self._BASIC_CELLS:
+                if not self._is_empty(info[key]):
+                    self.fill_table_cell(table1, row_idx, col_idx, info[key])
             
             # Academic positions (主要学术任职)
             if info["academic_positions"]:
-                positions_text = "\n".join(info["academic_positions"])
-                self.fill_table_cell(table1, 5, 1, positions_text)
+                # One paragraph per position
+                self.fill_table_cell_lines(table1, 5, 1, info["academic_positions"])
         
         # Fill Table 2: Innovations
         if len(tables) > 1:
             table2 = tables[1]
-            self.fill_table_cell(table2, 1, 0, self.form_data["innovations"])
-        
-        # Fill Table 3: Projects
-        if len(tables) > 2 and self.form_data["projects"]:
-            table3 = tables[2]
-            for i, project in enumerate(self.form_data["projects"], start=1):
-                if i < len(table3.rows):
-                    self.fill_table_cell(table3, i, 0, project["number"])
-                    self.fill_table_cell(table3, i, 1, project["name"])
-                    self.fill_table_cell(table3, i, 2, project["funding"])
-                    self.fill_table_cell(table3, i, 3, project["period"])
-                    self.fill_table_cell(table3, i, 4, project["source"])
+            if not self._is_empty(self.form_data["innovations"]):
+                self.fill_table_cell(table2, 1, 0, self.form_data["innovations"])
         
-        # Fill Table 4: Publications
-        if len(tables) > 3 and self.form_data["publications"]:
-            table4 = tables[3]
-            for i, pub in enumerate(self.form_data["publications"], start=1):
-                if i < len(table4.rows):
-                    self.fill_table_cell(table4, i, 0, pub["title"])
-                    self.fill_table_cell(table4, i, 1, pub["date"])
-                    self.fill_table_cell(table4, i, 2, pub["journal"])
-                    self.fill_table_cell(table4, i, 3, pub["volume"])
-                    self.fill_table_cell(table4, i, 4, pub["level"])
-                    self.fill_table_cell(table4, i, 5, pub["author_rank"])
-        
-        # Fill Table 5: Think Tank Results
-        if len(tables) > 4 and self.form_data["think_tank"]:
-            table5 = tables[4]
-            for i, result in enumerate(self.form_data["think_tank"], start=1):
-                if i < len(table5.rows):
-                    self.fill_table_cell(table5, i, 0, result["name"])
-                    self.fill_table_cell(table5, i, 1, result["year"])
-                    self.fill_table_cell(table5, i, 2, result["adopting_unit"])
-                    self.fill_table_cell(table5, i, 3, result["author_rank"])
-                    self.fill_table_cell(table5, i, 4, result["notes"])
-        
-        # Fill Table 6: Patents
-        if len(tables) > 5 and self.form_data["patents"]:
-            table6 = tables[5]
-            for i, patent in enumerate(self.form_data["patents"], start=1):
-                if i < len(table6.rows):
-                    self.fill_table_cell(table6, i, 0, patent["name"])
-                    self.fill_table_cell(table6, i, 1, patent["patent_number"])
-                    self.fill_table_cell(table6, i, 2, patent["year"])
-                    self.fill_table_cell(table6, i, 3, patent["country"])
-                    self.fill_table_cell(table6, i, 4, patent["author_rank"])
-                    self.fill_table_cell(table6, i, 5, patent["economic_benefit"])
-        
-        # Fill Table 7: Awards
-        if len(tables) > 6 and self.form_data["awards"]:
-            table7 = tables[6]
-            for i, award in enumerate(self.form_data["awards"], start=1):
-                if i < len(table7.rows):
-                    self.fill_table_cell(table7, i, 0, award["project_name"])
-                    self.fill_table_cell(table7, i, 1, award["award_type"])
-                    self.fill_table_cell(table7, i, 2, award["granting_unit"])
-                    self.fill_table_cell(table7, i, 3, award["award_date"])
+        # Fill Tables 3-7: one row per list entry
+        for table_idx, data_key, fields in self.TABLE_SPECS:
+            items = self.form_data[data_key]
+            if table_idx >= len(tables) or not items:
+                continue
+            # Skip the header row
+            trs = tables[table_idx]._tbl.tr_lst[1:1 + len(items)]
+            # Wipe leftover placeholder text in the rows being filled
+            for tr in trs:
+                for t in _ALL_T(tr):
+                    t.text = ""
+            for tr, item in zip(trs, items):
+                self.fill_row_cells(tr, [item[field] for field in fields])
     
     def save(self, output_path):
         """Save the filled document"""
         self.fill_form()
-        self.doc.save(output_path)
+        
+        # Anything beyond the main document's XML changed (new parts or
+        # relationships, edited headers, properties, ...): save the whole package
+        if self._package_signature(self.doc) != self._package_sig:
+            self.doc.save(output_path)
+            print(f"Document saved to: {output_path}")
+            return
+        
+        # Only the main document's XML can differ from the template, so
+        # re-serialize just that and copy every other part from the template bytes
+        doc_name = self.doc.part.partname.lstrip("/")
+        doc_xml = etree.tostring(self.doc.element, encoding="UTF-8", standalone=True)
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            for name, blob in self._parts:
+                zf.writestr(name, doc_xml if name == doc_name else blob)
         print(f"Document saved to: {output_path}")
 
 
 # Example usage:
 if __name__ == "__main__":
     # Create form filler instance
-    filler = ResearchAwardFormFiller("/home/lsyedith/py_test/empty_list.docx")  # Replace with your template path
+    filler = ResearchAwardFormFiller.from_cached_template("/home/lsyedith/py_test/empty_list.docx")  # Replace with your template path
     
     # Fill basic information
     filler.set_basic_info(
@@ -300,7 +429,7 @@ if __name__ == "__main__":
 
 
 # Initialize with your template document
-filler = ResearchAwardFormFiller("/home/lsyedith/py_test/empty_list.docx")
+filler = ResearchAwardFormFiller.from_cached_template("/home/lsyedith/py_test/empty_list.docx")
 
 # Fill in the information
 filler.set_basic_info(
@@ -1,4 +1,8 @@
+from copy import deepcopy
+
 from docx import Document
+from docx.oxml.ns import nsmap
+from lxml import etree
 
 DOC_PATH = "2025年度中国人民大学科研标兵评审表.docx"
 OUTPUT_PATH = "科研标兵评审表_填好表五.docx"
@@ -7,14 +11,15 @@ OUTPUT_PATH = "科研标兵评审表_填好表五.docx"
 doc = Document(DOC_PATH)
 
 # ---------- 2. 找到“表五” ----------
+# 一次 XPath 直接取出表格里所有 <w:t> 的文字，不用为每个单元格构造 python-docx 对象
+TABLE_TEXT = etree.XPath(".//w:t/text()", namespaces={"w": nsmap["w"]})
+
 def find_table_by_keyword(document, keyword: str):
     """
     返回第一张包含指定关键字的表格；若找不到则抛异常
     """
     for tbl in document.tables:
-        whole_text = "".join(
-            cell.text for row in tbl.rows for cell in row.cells
-        ).replace(" ", "").replace("\n", "")
+        whole_text = "".join(TABLE_TEXT(tbl._tbl)).replace(" ", "").replace("\n", "")
         if keyword in whole_text:
             return tbl
     raise ValueError(f"未找到包含关键字“{keyword}”的表格")
@@ -30,11 +35,27 @@ rows_to_insert = [
 ]
 
 # ---------- 4. 写入 ----------
-# 先看模板是否只剩表头一行；如果空行不够就 add_row
-rows_in_tpl = len(table5.rows)
+# 先看模板是否只剩表头一行；如果空行不够就补行
+tbl = table5._tbl
 rows_needed = 1 + len(rows_to_insert)        # 1 行表头 + N 行数据
-for _ in range(rows_needed - rows_in_tpl):
+rows_missing = rows_needed - len(tbl.tr_lst)
+if rows_missing > 0 and len(tbl.tr_lst) == 1:
+    # 表头行有合并单元格，不能拿来复制，先按表格网格 add_row 一行
     table5.add_row()
+    rows_missing -= 1
+
+# 其余的行直接复制最后一行的 <w:tr>（连同格式），比逐次 add_row() 快得多
+tr_tpl = tbl.tr_lst[-1]
+for _ in range(rows_missing):
+    tr = deepcopy(tr_tpl)
+    # 只清空复制出来的新行的文字，不动模板里已有的行
+    for t in tr.xpath('.//w:t'):
+        t.text = ""
+    # Word 要求 w14:paraId / w14:textId 唯一，复制出来的行和段落去掉这两个属性
+    for el in [tr, *tr.xpath('.//w:p')]:
+        for attr in [name for name in el.attrib if name.endswith(("}paraId", "}textId"))]:
+            del el.attrib[attr]
+    tbl.append(tr)
 
 # 假设第 0 行是表头，从第 1 行开始写
 start_idx = 1